@@ -1,8 +1,11 @@
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 import json
-from sklearn.metrics import adjusted_rand_score, normalized_mutual_info_score
-from sklearn.metrics.cluster import contingency_matrix
-from scipy.stats import entropy
+try:
+    import orjson               # Optional, but much faster on large clusterings
+except ImportError:
+    orjson = None
+from scipy import sparse
 import numpy as np
 import sys
 
@@ -30,12 +33,15 @@ def argparser():
 def load_json(handle) -> dict | None:
     """Load and return a JSON file, or None on failure."""
     try:
-        jsondata = json.load(handle)
-        if not jsondata:        # In case empty file
-            exit(f'No data in {handle.name}', file=sys.stderr)
-        return jsondata
-    except:
+        if orjson:
+            jsondata = orjson.loads(handle.buffer.read())
+        else:
+            jsondata = json.load(handle)
+    except Exception:
         exit(f'Could not load JSON data from {handle.name}')
+    if not jsondata:        # In case empty file
+        exit(f'No data in {handle.name}')
+    return jsondata
 
 
 def strip_species_prefix(seq_id: str) -> str:
@@ -46,13 +52,40 @@ def strip_species_prefix(seq_id: str) -> str:
     Detects the Species.ID format by checking if the part before
     the first dot looks like a species code (letters only, no digits).
     """
-    parts = seq_id.split(".", 1)
-    if len(parts) == 2 and parts[0].isalpha():
-        return parts[1]
+    prefix, dot, rest = seq_id.partition(".")
+    if dot and prefix.isalpha():
+        return rest
     return seq_id
 
 
-def invert_clusters(data: dict) -> dict[str, str]:
+def id_array(seqs: list, strip_prefixes: bool) -> np.ndarray:
+    """
+    Sequence IDs as a NumPy bytes array, optionally with species prefixes
+    stripped. Bytes take one byte per character, instead of four in a unicode
+    array, and compare with memcmp.
+
+    Non-ASCII IDs are stored UTF-8 encoded, which sorts the same way. Their
+    prefixes are stripped before encoding, since np.char.isalpha on bytes
+    only knows ASCII letters while str.isalpha knows all of them.
+    """
+    try:
+        seq_ids = np.array(seqs, dtype=bytes)
+    except UnicodeEncodeError:
+        if strip_prefixes:
+            seqs = [strip_species_prefix(seq) for seq in seqs]
+        return np.array([seq.encode() for seq in seqs], dtype=bytes)
+    return strip_species_prefixes(seq_ids) if strip_prefixes else seq_ids
+
+
+def strip_species_prefixes(seq_ids: np.ndarray) -> np.ndarray:
+    """
+    Vectorized strip_species_prefix over an ASCII bytes array of sequence IDs.
+    """
+    prefix, dot, rest = np.char.partition(seq_ids, b'.').T
+    return np.where((dot == b'.') & np.char.isalpha(prefix), rest, seq_ids)
+
+
+def invert_clusters(data: dict) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
     """
     Convert cluster-centric format to sequence-centric format.
 
@@ -61,101 +94,182 @@ def invert_clusters(data: dict) -> dict[str, str]:
       - Orthogroups format:   {'cluster_id': [seq1, seq2], ...}
 
     Also auto-detects and strips species prefixes (e.g. 'Acamar.WP_xxx')
-    so files with different ID formats can be compared directly.
+    so files with different ID formats can be compared directly. The format
+    is decided from the first sequence ID: if it has no prefix, no ID in the
+    file is stripped.
 
-    Returns: {sequence_id: cluster_label}
+    Returns: (sequence_ids, labels, cluster_names), where sequence_ids is sorted
+    and unique, and labels[i] is the index in cluster_names of the cluster
+    containing sequence_ids[i]. Cluster names are sorted too.
     """
     # Daniel/UniRef format: clusters live under a 'components' key
     if "components" in data and isinstance(data["components"], list):
-        clusters = data["components"]
-        return {
-            strip_species_prefix(seq): str(i)
-            for i, cluster in enumerate(clusters)
-            for seq in cluster
-        }
+        clusters = ((str(i), cluster) for i, cluster in enumerate(data["components"]))
+    else:
+        # Orthogroups format: direct {cluster_id: [seq_ids]}
+        clusters = ((cluster_id, members) for cluster_id, members in data.items()
+                    if isinstance(members, list))
+
+    names, sizes, seqs = [], [], []
+    for cluster_id, members in clusters:
+        names.append(cluster_id)
+        sizes.append(len(members))
+        seqs.extend(members)
 
-    # Orthogroups format: direct {cluster_id: [seq_ids]}
-    return {
-        strip_species_prefix(seq): cluster_id
-        for cluster_id, members in data.items()
-        if isinstance(members, list)
-        for seq in members
-    }
+    seq_ids = id_array(seqs, bool(seqs) and strip_species_prefix(seqs[0]) != seqs[0])
 
+    cluster_names, cluster_idx = np.unique(np.array(names, dtype=str), return_inverse=True)
+    labels = np.repeat(cluster_idx.astype(np.int32), sizes)
+    # A sequence listed more than once is assigned to its last cluster, so
+    # take the first occurrence in the reversed array
+    seq_ids, last = np.unique(seq_ids[::-1], return_index=True)
+    return seq_ids, labels[len(labels) - 1 - last], cluster_names
 
 
-def compare_clusterings(inv1: dict, inv2: dict, compare_clusters) -> None:
+def compare_clusterings(inv1: tuple, inv2: tuple, compare_clusters) -> None:
     """
-    Compare two sequence->cluster mappings and print ARS and NMI scores.
+    Compare two sequence->cluster mappings, as returned by invert_clusters,
+    and print ARS and NMI scores.
     Only sequences present in both files are compared.
     """
-    keys1, keys2 = set(inv1.keys()), set(inv2.keys())
-    common = keys1 & keys2
-    only_in_1 = keys1 - keys2
-    only_in_2 = keys2 - keys1
+    keys1, lab1, names1 = inv1
+    keys2, lab2, _ = inv2
+    # Both key arrays are sorted and unique, so binary search matches them
+    # without sorting again. The common sequences keep the order of keys1.
+    pos = np.searchsorted(keys2, keys1)
+    found = pos < len(keys2)
+    found[found] = keys2[pos[found]] == keys1[found]
+    i1 = np.flatnonzero(found)
+    i2 = pos[i1]
+    n_common = len(i1)
+    only_in_1 = len(keys1) - n_common
+    only_in_2 = len(keys2) - n_common
 
     if only_in_1:
-        print(f"  Note: {len(only_in_1)} sequences only in file 1 (excluded)", file=sys.stderr)
+        print(f"  Note: {only_in_1} sequences only in file 1 (excluded)", file=sys.stderr)
     if only_in_2:
-        print(f"  Note: {len(only_in_2)} sequences only in file 2 (excluded)", file=sys.stderr)
+        print(f"  Note: {only_in_2} sequences only in file 2 (excluded)", file=sys.stderr)
 
-    if not common:
+    if not n_common:
         exit(f"Error: No sequences in common between the two files.")
     else:
-        print(f"  Sequences in common: {len(common)}")
+        print(f"  Sequences in common: {n_common}")
 
-    # Build parallel label lists sorted for reproducibility
-    sorted_seqs = sorted(common)
-    labels1 = [inv1[s] for s in sorted_seqs]
-    labels2 = [inv2[s] for s in sorted_seqs]
+    labels1 = lab1[i1]
+    labels2 = lab2[i2]
 
-    ars = adjusted_rand_score(labels1, labels2)
-    nmi = normalized_mutual_info_score(labels1, labels2)
+    # One contingency matrix serves both scores and the broken-cluster report
+    true_idx, M = contingency(labels1, labels2)
+    ars, nmi = scores_from_contingency(M)
 
     print(f"\nAdjusted Rand Score   : {ars:7.4f}")
     print(f"Normalized Mutual Info: {nmi:7.4f}")
 
     if compare_clusters:
-        output_broken_clusters(labels1, labels2)
+        output_broken_clusters(names1[true_idx], M)
 
 
-def output_broken_clusters(labels1, labels2):
-    M = contingency_matrix(labels1, labels2, sparse=True)
-    true_labels = np.sort(np.unique(labels1)) # Gather the labels in the order that sklearn enumerates them
-    header_label = 'Cluster' 
-    label_width = max(len(header_label), max(map(len, true_labels)))
+def compact_labels(labels: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Renumber non-negative integer labels to 0..k-1, keeping their order.
+    Same result as np.unique(labels, return_inverse=True), but without sorting.
+    """
+    present = np.bincount(labels) > 0
+    remap = np.cumsum(present, dtype=np.int32) - 1
+    return np.flatnonzero(present), remap[labels]
 
-    print(f'{header_label:{label_width}}   Entropy  Purity    Gini  Only "broken" clusters reported')
-    for idx, label in enumerate(true_labels):
-        row = M.getrow(idx).toarray().ravel()
-        h = entropy(row)
-        if h > 0:
-            purity = row.max() / row.sum()
-            gini = gini_helper(row)
-            print(f'{label:{label_width}}  {h:7.4}  {purity:7.4} {gini:7.4}')
+
+def contingency(labels1, labels2):
+    """
+    Build the sparse contingency matrix of two parallel arrays of cluster indices.
+
+    Returns the cluster indices of labels1 that index the rows, and the matrix
+    in CSR format (rows: labels1, columns: labels2). Clusters that none of the
+    given sequences belong to get no row or column.
+    """
+    true_idx, codes1 = compact_labels(labels1)
+    pred_idx, codes2 = compact_labels(labels2)
+    M = sparse.coo_matrix((np.ones(len(codes1), dtype=np.int32), (codes1, codes2)),
+                          shape=(len(true_idx), len(pred_idx)))
+    return true_idx, M.tocsr()
 
 
-def gini_helper(row):
-    rowsum = row.sum()
-    pvec = row / rowsum
-    return 1.0 - np.sum(pvec * pvec)
-        
+def scores_from_contingency(M) -> tuple[float, float]:
+    """
+    Adjusted Rand Score and Normalized Mutual Information (arithmetic
+    normalization, like sklearn's default) computed together from a CSR
+    contingency matrix, with the same limit cases as sklearn.
+    """
+    nij = M.data.astype(np.float64)
+    rows = np.repeat(np.arange(M.shape[0]), np.diff(M.indptr))
+    a = np.bincount(rows, weights=nij, minlength=M.shape[0])
+    b = np.bincount(M.indices, weights=nij, minlength=M.shape[1])
+    n = nij.sum()
+
+    # The pair counts are exact in int64; only the final ratio needs floats
+    c_int = M.data.astype(np.int64)
+    a_int = a.astype(np.int64)
+    b_int = b.astype(np.int64)
+    sum_comb_c = int(np.sum((c_int * (c_int - 1)) >> 1))
+    sum_comb_a = int(np.sum((a_int * (a_int - 1)) >> 1))
+    sum_comb_b = int(np.sum((b_int * (b_int - 1)) >> 1))
+    n_int = int(c_int.sum())
+    total = n_int * (n_int - 1) // 2
+    if sum_comb_a == sum_comb_b and sum_comb_a in (0, total):
+        ars = 1.0               # Both all singletons or both one big cluster
+    else:
+        expected = sum_comb_a * sum_comb_b / total
+        max_index = (sum_comb_a + sum_comb_b) / 2
+        ars = (sum_comb_c - expected) / (max_index - expected)
+
+    if M.shape == (1, 1):
+        nmi = 1.0               # Neither clustering splits the data: a perfect match
+    elif 1 in M.shape:
+        nmi = 0.0               # Only one of them does, so there is no shared information
+    else:
+        mi = max(0.0, np.sum(nij / n * np.log(n * nij / (a[rows] * b[M.indices]))))
+        h_true = -np.sum(a / n * np.log(a / n))
+        h_pred = -np.sum(b / n * np.log(b / n))
+        nmi = mi / ((h_true + h_pred) / 2)
+    return float(ars), float(nmi)
+
+
+def output_broken_clusters(true_labels, M):
+    header_label = 'Cluster' 
+    label_width = max(len(header_label), int(np.char.str_len(true_labels).max()))
+
+    # Per-row statistics straight from the CSR arrays. Every row has at least
+    # one non-zero entry, since each true label occurs among the sequences.
+    M = M.tocsr()
+    starts = M.indptr[:-1]
+    row_of_entry = np.repeat(np.arange(M.shape[0]), np.diff(M.indptr))
+    rowsums = np.add.reduceat(M.data, starts)
+    p = M.data / rowsums[row_of_entry]
+    # One scratch buffer, filled in place, serves both entropy and Gini
+    scratch = np.log(p)
+    scratch *= p
+    entropies = -np.add.reduceat(scratch, starts)
+    np.multiply(p, p, out=scratch)
+    ginis = 1.0 - np.add.reduceat(scratch, starts)
+    purities = np.maximum.reduceat(M.data, starts) / rowsums
+
+    print(f'{header_label:{label_width}}   Entropy  Purity    Gini  Only "broken" clusters reported')
+    for idx in np.flatnonzero(entropies > 0):
+        print(f'{true_labels[idx]:{label_width}}  {entropies[idx]:7.4}  {purities[idx]:7.4} {ginis[idx]:7.4}')
 
 
 def main():
     ap = argparser()
     args = ap.parse_args()
     
-    json1 = load_json(args.jsonfile1)
-    json2 = load_json(args.jsonfile2)
-
-    print("\nProcessing file 1...", file=sys.stderr)
-    inv1 = invert_clusters(json1)
-    print(f"  {len(inv1)} sequences found", file=sys.stderr)
-
-    print("Processing file 2...", file=sys.stderr)
-    inv2 = invert_clusters(json2)
-    print(f"  {len(inv2)} sequences found", file=sys.stderr)
+    # The two files are independent: overlap their reading and parsing
+    print("\nProcessing files 1 and 2...", file=sys.stderr)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        future1 = executor.submit(lambda: invert_clusters(load_json(args.jsonfile1)))
+        future2 = executor.submit(lambda: invert_clusters(load_json(args.jsonfile2)))
+        inv1, inv2 = future1.result(), future2.result()
+    print(f"  {len(inv1[0])} sequences found in file 1", file=sys.stderr)
+    print(f"  {len(inv2[0])} sequences found in file 2", file=sys.stderr)
 
     print("\nComparing clusterings...", file=sys.stderr)
     compare_clusterings(inv1, inv2, args.c)
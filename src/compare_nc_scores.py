@@ -1,7 +1,14 @@
 import argparse
+import os
+import sys
 import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
 import seaborn as sns
 
+HEXBIN_THRESHOLD = 50_000      # Number of pairs above which a scatter plot is too heavy
+
+
 def argparser():
     '''
     Set up simple program arguments so we can work on the command line.
@@ -10,51 +17,62 @@ def argparser():
                                  description='Compare NC scores computed in different ways.')
     ap.add_argument('-x', type=str, help='Label for x axis, if filename is not sufficient')
     ap.add_argument('-y', type=str, help='Label for y axis, if filename is not sufficient')
-    ap.add_argument('nc1', type=argparse.FileType('r'),
+    ap.add_argument('nc1', type=str,
                     help='Path to JSON file containing NC scores for x coordinates.')
-    ap.add_argument('nc2', type=argparse.FileType('r'),
+    ap.add_argument('nc2', type=str,
                     help='Another path to a JSON file containing NC scores for y coordinates.')
     ap.add_argument('outfile', type=str,
                     help='Where to put the output PDF')
     return ap
 
 
-def read_nc_scores(scorefile):
-    scores = dict()
-    for line in scorefile:
-        cols = line.split()
-        if len(cols) != 3:
-            raise ValueError(f'Expected three columns, but got "{line}".')
-        left, right, val = cols
-        if left < right:
-            scores[left, right] = float(val)
-        elif right < left:
-            scores[right, left] = float(val)
-    return scores
+def read_nc_scores(path):
+    '''
+    Read lines of "left right score" into a DataFrame with columns l, r and v,
+    with each pair ordered so that l < r. Scores of a sequence with itself are
+    ignored, and if a pair occurs more than once the last score is kept.
+    Regular files are memory-mapped and parsed as bytes by pandas' C reader.
+    A path of '-' reads standard input.
+    '''
+    if path == '-':
+        source, mappable = sys.stdin.buffer, False
+    else:
+        source, mappable = path, os.path.isfile(path) and os.path.getsize(path) > 0
+    try:
+        # keep_default_na=False: sequence IDs like 'NA' or 'null' are just strings here
+        df = pd.read_csv(source, sep=r'\s+', header=None, dtype=str, engine='c', memory_map=mappable,
+                         keep_default_na=False)
+    except pd.errors.EmptyDataError:
+        return pd.DataFrame(columns=['l', 'r', 'v'])
+    if df.shape[1] != 3 or (df == '').any(axis=None):
+        raise ValueError(f'Expected three columns in every line of {path}.')
+    df.columns = ['l', 'r', 'v']
+    df['v'] = df.v.astype(float)
+
+    left, right = df.l.to_numpy(), df.r.to_numpy()
+    in_order = left < right
+    df = df.assign(l=np.where(in_order, left, right), r=np.where(in_order, right, left))
+    df = df[df.l != df.r]
+    return df.drop_duplicates(subset=['l', 'r'], keep='last')
 
 
 def plot_scores(nc1, nc2):
-    s1 = set(nc1.keys())
-    s2 = set(nc2.keys())
-    
-    joint = s1 & s2
-    unique_s1 = s1 - s2
-    unique_s2 = s2 - s1
-
-    x = list()
-    y = list()
-    for pair in joint:
-        x.append(nc1[pair])
-        y.append(nc2[pair])
-
-    for pair in unique_s1:
-        x.append(nc1[pair])
-        y.append(0.0)
-
-    for pair in unique_s2:
-        x.append(0.0)
-        y.append(nc2[pair])
-
+    # Encode the sequence IDs of both files in one shared table and pack each
+    # (l, r) pair into a single uint64 key, so the join runs on sorted ints.
+    codes, _ = pd.factorize(np.concatenate([nc1.l, nc1.r, nc2.l, nc2.r]))
+    l1, r1, l2, r2 = np.split(codes.astype(np.uint64), np.cumsum([len(nc1), len(nc1), len(nc2)]))
+    key1 = (l1 << 32) | r1
+    key2 = (l2 << 32) | r2
+
+    # Pairs scored in only one of the files get score 0.0 in the other
+    keys = np.union1d(key1, key2)
+    x = np.zeros(len(keys))
+    y = np.zeros(len(keys))
+    x[np.searchsorted(keys, key1)] = nc1.v
+    y[np.searchsorted(keys, key2)] = nc2.v
+    if len(x) > HEXBIN_THRESHOLD:
+        # Drawing every point is slow and gives huge PDFs; plot binned densities instead
+        return sns.jointplot(x=x, y=y, kind='hex', gridsize=200, bins='log', color='blue')
     return sns.jointplot(x=x, y=y, kind='scatter', alpha=0.3, marker='.', color='blue')
 
 
@@ -69,11 +87,11 @@ def main():
     if args.x:
         fig.ax_joint.set_xlabel(args.x)
     else:
-        fig.ax_joint.set_xlabel(args.nc1.name)
+        fig.ax_joint.set_xlabel(args.nc1)
     if args.y:
         fig.ax_joint.set_ylabel(args.y)
     else:
-        fig.ax_joint.set_ylabel(args.nc2.name)
+        fig.ax_joint.set_ylabel(args.nc2)
     plt.savefig(args.outfile)
     
     
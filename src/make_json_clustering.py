@@ -1,6 +1,11 @@
 import argparse
+from collections import defaultdict
 from enum import IntEnum
 import json
+try:
+    import orjson               # Optional, but much faster on large clusterings
+except ImportError:
+    orjson = None
 import sys
 
 description_text = """
@@ -35,18 +40,11 @@ def convert(handle, cluster_column, seq_column):
     Handle is an open readable file.
     clustercolumn and seq_columns are integers, 0 for left column and 1 for right column.
     """
-    d = dict()
+    d = defaultdict(list)
     for line in handle:
-        line = line.strip()
         columns = line.split()
-        family = columns[cluster_column]
-        prot = columns[seq_column]
-        
-        if family in d:
-            d[family].append(prot)
-        else:
-            d[family] = [prot]
-    return d
+        d[columns[cluster_column]].append(columns[seq_column])
+    return dict(d)
 
 
 
@@ -64,7 +62,10 @@ def main():
         print('Wrong usage. Look at the options.', file=sys.stderr)
         sys.exit(1)
 
-    print(json.dumps(d))    
+    if orjson:
+        print(orjson.dumps(d).decode())
+    else:
+        print(json.dumps(d))
 
 
 if __name__ == "__main__":